@@ -1,13 +1,15 @@
 import os
+import io
+import csv
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta
-import pytz
 from src.youtube_automation.services.api_services import (
     setup_google_sheets,
     get_youtube_service,
     get_playlist_videos,
-    get_spreadsheet_videos
+    get_spreadsheet_videos,
+    append_results_to_spreadsheet,
+    clear_video_caches
 )
 from src.youtube_automation.api.youtube_api import download_video, upload_video
 from src.youtube_automation.utils.helpers import (
@@ -60,6 +62,15 @@ with url_container:
             key="sheets_url",
             help="Paste a Google Sheets URL here"
         )
+        write_results = st.checkbox(
+            "Write results back to the spreadsheet",
+            value=False,
+            help="Append the processed videos summary to a 'Results' worksheet"
+        )
+
+    # Video lists are cached for a minute; allow fetching the latest ones now
+    if st.button("🔄 Refresh", help="Fetch the latest videos instead of cached results"):
+        clear_video_caches()
 
 # Add start button - enabled as soon as there's any text in the URL field
 start_button = st.button(
@@ -74,6 +85,7 @@ if start_button:
     if input_method == "YouTube Playlist":
         if validate_url(url_input):
             videos = get_playlist_videos(url_input)
+            config['source_playlist'] = url_input
         else:
             st.error("Please enter a valid YouTube URL")
     else:
@@ -99,19 +111,17 @@ if start_button:
             st.write(f"Total videos processed: {len(processed_videos)}")
             
             try:
-                # Create DataFrame
-                df = pd.DataFrame(processed_videos)
-                st.write("DataFrame created with columns:", df.columns.tolist())
-                
                 # Get all columns including pattern search columns
                 base_columns = ["Starting Number", "Scheduled Date", "Uploaded Video URL", "Channel Name", "Original Video URL"]
-                pattern_columns = [col for col in df.columns if col not in base_columns]
+                result_columns = dict.fromkeys(col for video in processed_videos for col in video)
+                pattern_columns = [col for col in result_columns if col not in base_columns]
                 
                 # Combine base columns with pattern columns at the end
                 all_columns = base_columns + pattern_columns
                 
-                # Reorder columns
-                df = df[all_columns]
+                # Write all results back to the spreadsheet in a single request
+                if input_method == "Google Sheets" and write_results:
+                    append_results_to_spreadsheet(sheets_client, url_input, processed_videos, all_columns)
                 
                 # Create column configuration
                 column_config = {
@@ -144,23 +154,32 @@ if start_button:
                         help=f"Pattern match result for {col}"
                     )
                 
-                # Display the table with highlighting
+                # Display the table directly from the result rows
                 st.dataframe(
-                    df,
+                    processed_videos,
                     column_config=column_config,
+                    column_order=all_columns,
                     hide_index=True,
                     use_container_width=True
                 )
                 
-                # Add download button for the entire table
+                def summary_csv():
+                    buffer = io.StringIO()
+                    writer = csv.DictWriter(buffer, fieldnames=all_columns)
+                    writer.writeheader()
+                    writer.writerows(processed_videos)
+                    return buffer.getvalue().encode()
+                
+                # Add download button for the entire table; the CSV is only
+                # generated when the button is clicked
                 st.write("")  # Add some spacing
-                csv = df.to_csv(index=False)
                 st.download_button(
                     "📥 Download Summary as CSV",
-                    csv,
-                    "processed_videos.csv",
-                    "text/csv",
+                    data=summary_csv,
+                    file_name="processed_videos.csv",
+                    mime="text/csv",
                     key='download-csv',
+                    on_click='ignore',
                     use_container_width=True
                 )
             except Exception as e:
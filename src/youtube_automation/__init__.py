@@ -5,17 +5,22 @@ This package provides functionality for automating the process of downloading,
 processing, and uploading YouTube Shorts videos.
 """
 
-from .api.youtube_api import download_video, upload_video
+from .api.youtube_api import download_video, upload_video, apply_status_updates
 from .services.api_services import (
     setup_google_sheets,
     get_youtube_service,
     get_playlist_videos,
-    get_spreadsheet_videos
+    get_spreadsheet_videos,
+    append_results_to_spreadsheet,
+    clear_video_caches
 )
 from .utils.helpers import (
     format_title,
     format_description,
+    format_both,
+    is_valid_youtube_url,
     validate_url,
+    create_directory,
     ensure_directory,
     clean_filename
 )
@@ -23,6 +28,7 @@ from .templates import (
     load_templates,
     save_template,
     delete_template,
+    flush_templates,
     render_template_manager
 )
 
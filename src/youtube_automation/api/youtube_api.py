@@ -1,15 +1,191 @@
 # Standard library imports
+import json
+import mimetypes
+import mmap
 import os
+import queue
+import random
+import re
+import shutil
+import threading
 import time
+from contextlib import contextmanager
+from datetime import timezone
+from zoneinfo import ZoneInfo
 
-# Third-party imports
+# Third-party imports; yt-dlp, httplib2 and the Google API client are
+# imported where they're used so loading the package stays cheap
 import streamlit as st
-import pytz
-import yt_dlp
-from googleapiclient.http import MediaFileUpload
-from googleapiclient.errors import HttpError
 
-def download_video(url, output_path, max_retries=3):
+# Local imports
+from ..utils.media import probe_video
+
+# Resumable uploads send the file in chunks of this size
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Google's recommended retry policy for interrupted resumable uploads
+RETRIABLE_STATUS_CODES = {500, 502, 503, 504}
+# httplib2.HttpLib2Error is added where uploads catch these
+RETRIABLE_EXCEPTIONS = (ConnectionError, TimeoutError)
+MAX_UPLOAD_RETRIES = 5
+
+# Parallel connections per download, each fetching its own byte range
+DOWNLOAD_CONNECTIONS = 8
+
+# Per-user request budget for the YouTube Data API
+YOUTUBE_QPM = 60
+
+# Each videos.insert costs 1600 units of the default 10,000 unit daily quota
+UPLOAD_QUOTA_COST = 1600
+DAILY_QUOTA = 10000
+
+# Uploads sent at once; more than this just splits the upstream bandwidth
+MAX_CONCURRENT_UPLOADS = 3
+
+# 403/429 reasons that mean "slow down" and are worth retrying. quotaExceeded is
+# the daily quota, which no amount of waiting within a batch will restore.
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Naive scheduled times are interpreted in US Eastern time
+_EST = ZoneInfo('America/New_York')
+
+# Video ID in watch, youtu.be and Shorts URLs
+_VIDEO_ID_RE = re.compile(r'(?:v=|youtu\.be/|shorts/)([\w-]{11})')
+
+class RateLimiter:
+    """Thread-safe token bucket that spaces out requests to a per-minute budget."""
+    
+    def __init__(self, requests_per_minute):
+        self.capacity = requests_per_minute
+        self.rate = requests_per_minute / 60.0
+        self.tokens = float(requests_per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self, tokens=1):
+        """Block until `tokens` requests may be sent."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait_time = (tokens - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+_youtube_rate_limiter = RateLimiter(YOUTUBE_QPM)
+_upload_slots = threading.BoundedSemaphore(MAX_CONCURRENT_UPLOADS)
+
+# One lock per download path, so a video listed twice is downloaded once
+_download_locks = {}
+_download_locks_guard = threading.Lock()
+
+def _download_lock(path):
+    """Return the lock serializing downloads to path."""
+    with _download_locks_guard:
+        return _download_locks.setdefault(path, threading.Lock())
+
+def _error_reason(error):
+    """Return the reason code of a Google API HttpError, if it has one."""
+    try:
+        return json.loads(error.content)['error']['errors'][0]['reason']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+
+def call_youtube(call, cost=1):
+    """Run a YouTube API call within the shared rate limit.
+    
+    Args:
+        call: Zero-argument callable that sends the request(s)
+        cost (int): Number of API requests the call sends
+    
+    Rate-limit errors are retried with exponential backoff; every other error
+    is raised to the caller.
+    """
+    from googleapiclient.errors import HttpError
+    
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        _youtube_rate_limiter.acquire(cost)
+        try:
+            return call()
+        except HttpError as e:
+            if (e.resp.status not in (403, 429)
+                    or _error_reason(e) not in RATE_LIMIT_REASONS
+                    or attempt == MAX_RATE_LIMIT_RETRIES):
+                raise
+            wait_time = min(64, 2 ** attempt) + random.random()
+            st.warning(f"YouTube API rate limit reached, retrying in {wait_time:.1f} seconds...")
+            time.sleep(wait_time)
+
+def ydl_opts_for(output_path, high_quality=False):
+    """Build the yt-dlp options used to download videos into output_path.
+    
+    By default a single pre-muxed MP4 is requested, which Shorts almost always
+    have, so no ffmpeg merge pass is needed. high_quality picks the best
+    separate video and audio streams and merges them instead.
+    """
+    ydl_opts = {
+        'format': 'best[ext=mp4][vcodec!=none][acodec!=none]/best[ext=mp4]/best',
+        'outtmpl': os.path.join(output_path, '%(id)s.%(ext)s'),  # Use video ID for consistent naming
+        'quiet': True,
+        'no_warnings': True,
+        'extract_flat': False,
+        'ignoreerrors': True,
+        'continuedl': True,  # Resume interrupted downloads from their .part file
+        'concurrent_fragment_downloads': 4  # Fetch HLS/DASH fragments in parallel
+    }
+    if shutil.which('aria2c'):
+        # Split progressive downloads into parallel Range requests so a
+        # throttled per-connection rate doesn't cap the total throughput
+        ydl_opts['external_downloader'] = {'http': 'aria2c'}
+        ydl_opts['external_downloader_args'] = {
+            'aria2c': ['-x', str(DOWNLOAD_CONNECTIONS), '-s', str(DOWNLOAD_CONNECTIONS), '-k', '1M']
+        }
+    else:
+        # Without aria2c, request ranges one at a time to sidestep throttling
+        ydl_opts['http_chunk_size'] = 10 * 1024 * 1024
+    if high_quality:
+        ydl_opts['format'] = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
+        ydl_opts['merge_output_format'] = 'mp4'
+    return ydl_opts
+
+@st.cache_resource(show_spinner=False)
+def _get_ydl_pool(output_path, high_quality=False):
+    """Return the pool of idle YoutubeDL instances for output_path.
+    
+    The pool outlives Streamlit reruns so extractor setup is paid once.
+    """
+    return queue.SimpleQueue()
+
+@contextmanager
+def get_ydl(output_path, high_quality=False):
+    """Borrow a YoutubeDL instance for output_path from the shared pool.
+    
+    A YoutubeDL instance is not safe to use from two downloads at once, so each
+    worker holds one exclusively and returns it to the pool when done.
+    """
+    pool = _get_ydl_pool(output_path, high_quality)
+    try:
+        ydl = pool.get_nowait()
+    except queue.Empty:
+        import yt_dlp
+        ydl = yt_dlp.YoutubeDL(ydl_opts_for(output_path, high_quality))
+    try:
+        yield ydl
+    finally:
+        pool.put(ydl)
+
+def is_usable_video(path):
+    """Check that a downloaded file is non-empty and, if ffprobe is installed, readable."""
+    if os.path.getsize(path) == 0:
+        return False
+    return not shutil.which('ffprobe') or probe_video(path) is not None
+
+def download_video(url, output_path, max_retries=3, high_quality=False, existing_files=None):
     """
     Download a video from YouTube using yt-dlp with retry logic and better error handling.
     
@@ -17,27 +193,46 @@ def download_video(url, output_path, max_retries=3):
         url (str): YouTube video URL
         output_path (str): Directory to save the video
         max_retries (int): Maximum number of retry attempts
+        high_quality (bool): Merge the best separate video and audio streams
+        existing_files (set): Optional snapshot of the file names in output_path,
+            checked for a previous download instead of the filesystem
     """
+    # Downloads are named by video ID, so a previous download can be reused
+    # without asking yt-dlp (and the network) about the video again. Workers
+    # fetching the same video wait here for the first one to finish.
+    match = _VIDEO_ID_RE.search(url)
+    if not match:
+        return _download_video(url, output_path, max_retries, high_quality, existing_files)
+    existing_name = f"{match.group(1)}.mp4"
+    existing_path = os.path.join(output_path, existing_name)
+    with _download_lock(existing_path):
+        if existing_files is not None:
+            already_downloaded = existing_name in existing_files
+        else:
+            already_downloaded = os.path.exists(existing_path)
+        if already_downloaded:
+            # yt-dlp only renames a finished download, but a file can still be
+            # left empty or corrupt; those are downloaded again
+            if is_usable_video(existing_path):
+                st.success(f"Using previously downloaded video at {existing_path}")
+                return existing_path
+            st.warning(f"Previously downloaded video at {existing_path} is unreadable, downloading again...")
+            os.remove(existing_path)
+            if existing_files is not None:
+                existing_files.discard(existing_name)
+        return _download_video(url, output_path, max_retries, high_quality, existing_files)
+
+def _download_video(url, output_path, max_retries, high_quality, existing_files):
+    """Download a video with yt-dlp, retrying on errors; see download_video."""
     for attempt in range(max_retries):
         try:
             # Add progress information
             st.write(f"Attempting to download video (attempt {attempt + 1}/{max_retries})...")
             
-            # Configure yt-dlp options
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'outtmpl': os.path.join(output_path, '%(id)s.%(ext)s'),  # Use video ID for consistent naming
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': False,
-                'ignoreerrors': True,
-                'merge_output_format': 'mp4'
-            }
-            
-            # Create yt-dlp object and get video info
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Get video information first
-                info = ydl.extract_info(url, download=False)
+            # Reuse a pooled yt-dlp object, fetch the video info and download in one pass
+            with get_ydl(output_path, high_quality) as ydl:
+                st.write("Downloading video...")
+                info = ydl.extract_info(url, download=True)
                 if not info:
                     st.error("Could not get video information")
                     continue
@@ -54,33 +249,21 @@ def download_video(url, output_path, max_retries=3):
 - Duration: {info.get('duration', 0)} seconds
 - Resolution: {info.get('height', 'Unknown')}p""")
                 
-                # Download the video
-                st.write("Downloading video in highest quality available...")
-                ydl.download([url])
+                # yt-dlp reports the final (post-merge) path of what it downloaded
+                requested_downloads = info.get('requested_downloads') or []
+                if requested_downloads and requested_downloads[-1].get('filepath'):
+                    video_path = requested_downloads[-1]['filepath']
+                else:
+                    video_path = os.path.join(output_path, f"{video_id}.mp4")
                 
-                # Get the expected output filename
-                expected_video_path = os.path.join(output_path, f"{video_id}.mp4")
-                st.write(f"Looking for downloaded file at: {expected_video_path}")
+                if os.path.exists(video_path):
+                    st.success(f"Successfully downloaded video to {video_path}")
+                    if existing_files is not None:
+                        existing_files.add(os.path.basename(video_path))
+                    return video_path
                 
-                # Check if file exists
-                if os.path.exists(expected_video_path):
-                    st.success(f"Successfully downloaded video to {expected_video_path}")
-                    return expected_video_path
-                else:
-                    # If the expected path doesn't exist, try to find any .mp4 file that was just created
-                    mp4_files = [f for f in os.listdir(output_path) if f.endswith('.mp4')]
-                    st.write(f"Found {len(mp4_files)} MP4 files in output directory: {mp4_files}")
-                    
-                    if mp4_files:
-                        # Get the most recently created .mp4 file
-                        latest_file = max([os.path.join(output_path, f) for f in mp4_files], 
-                                        key=os.path.getctime)
-                        st.success(f"Found downloaded video at alternate location: {latest_file}")
-                        return latest_file
-                    
-                    st.error(f"Download completed but file not found in {output_path}")
-                    st.write(f"Directory contents: {os.listdir(output_path)}")
-                    continue
+                st.error(f"Download completed but file not found at {video_path}")
+                continue
             
         except Exception as e:
             error_msg = str(e).lower()
@@ -119,8 +302,14 @@ def upload_video(youtube, video_path, title, description, privacy_status="privat
         scheduled_time (datetime): When to publish the video (if privacy_status is 'scheduled')
     
     Returns:
-        str: Video ID if successful, None otherwise
+        tuple: (video_id, pending_update) where pending_update is the body of the
+            privacy status update still to be applied with apply_status_updates,
+            or None if nothing is pending. (None, None) if the upload failed.
     """
+    import httplib2
+    from googleapiclient.errors import HttpError
+    from googleapiclient.http import MediaIoBaseUpload
+    
     try:
         body = {
             'snippet': {
@@ -138,9 +327,8 @@ def upload_video(youtube, video_path, title, description, privacy_status="privat
         if scheduled_time:
             # Convert to UTC for YouTube API
             if scheduled_time.tzinfo is None:
-                est = pytz.timezone('US/Eastern')
-                scheduled_time = est.localize(scheduled_time)
-            utc_time = scheduled_time.astimezone(pytz.UTC)
+                scheduled_time = scheduled_time.replace(tzinfo=_EST)
+            utc_time = scheduled_time.astimezone(timezone.utc)
             
             # Add publishAt time - video will automatically become public at this time
             body['status'].update({
@@ -148,51 +336,103 @@ def upload_video(youtube, video_path, title, description, privacy_status="privat
             })
             st.write(f"Video will be published at: {utc_time.isoformat()} UTC")
 
-        # Upload the video
-        insert_request = youtube.videos().insert(
-            part=','.join(body.keys()),
-            body=body,
-            media_body=MediaFileUpload(
-                video_path, 
-                chunksize=-1, 
-                resumable=True
+        with _upload_slots, open(video_path, 'rb') as video_file, \
+                mmap.mmap(video_file.fileno(), 0, access=mmap.ACCESS_READ) as video_map:
+            # Upload the video from a read-only memory map, so chunks are sliced
+            # straight out of the page cache instead of read into a file buffer
+            insert_request = youtube.videos().insert(
+                part=','.join(body.keys()),
+                body=body,
+                media_body=MediaIoBaseUpload(
+                    video_map,
+                    mimetype=mimetypes.guess_type(video_path)[0] or 'video/mp4',
+                    chunksize=UPLOAD_CHUNK_SIZE,
+                    resumable=True
+                )
             )
-        )
         
-        response = None
-        while response is None:
-            status, response = insert_request.next_chunk()
-            if status:
-                progress = int(status.progress() * 100)
-                st.write(f"Upload progress: {progress}%")
+            progress_bar = st.progress(0.0, text="Upload progress: 0%")
+            response = None
+            retry = 0
+            while response is None:
+                try:
+                    # Only starting the upload session counts against the API budget;
+                    # chunks are sent to the session URI
+                    status, response = call_youtube(
+                        insert_request.next_chunk,
+                        cost=0 if insert_request.resumable_uri else 1
+                    )
+                except (HttpError, httplib2.HttpLib2Error, *RETRIABLE_EXCEPTIONS) as e:
+                    if isinstance(e, HttpError) and e.resp.status not in RETRIABLE_STATUS_CODES:
+                        raise
+                    if retry >= MAX_UPLOAD_RETRIES:
+                        raise
+                    # Exponential backoff; the next chunk resumes where the upload stopped
+                    retry += 1
+                    wait_time = min(64, 2 ** retry) + random.random()
+                    st.warning(f"Upload interrupted ({str(e)}), retrying in {wait_time:.1f} seconds...")
+                    time.sleep(wait_time)
+                    continue
+                retry = 0
+                if status:
+                    progress = status.progress()
+                    progress_bar.progress(progress, text=f"Upload progress: {int(progress * 100)}%")
+        progress_bar.progress(1.0, text="Upload progress: 100%")
         
         video_id = response['id']
         
         if scheduled_time:
             st.success(f"Video uploaded and scheduled! It will remain private until {scheduled_time.strftime('%Y-%m-%d %I:%M %p %Z')}")
         else:
-            # For non-scheduled videos, update to the requested privacy status if it's not private
+            # For non-scheduled videos, the requested privacy status is applied later
+            # in a single batch request together with the other uploads
             if privacy_status != 'private':
-                update_body = {
+                pending_update = {
                     'id': video_id,
                     'status': {
                         'privacyStatus': privacy_status
                     }
                 }
-                try:
-                    youtube.videos().update(
-                        part='status',
-                        body=update_body
-                    ).execute()
-                except Exception as e:
-                    st.warning(f"Video uploaded but privacy status might not be set correctly: {str(e)}")
+                st.success(f"Video uploaded successfully! Video ID: {video_id} (will be set to {privacy_status})")
+                return video_id, pending_update
             st.success(f"Video uploaded successfully! Video ID: {video_id}")
         
-        return video_id
+        return video_id, None
         
     except HttpError as e:
         st.error(f"An HTTP error {e.resp.status} occurred: {e.content}")
-        return None
+        return None, None
     except Exception as e:
         st.error(f"An error occurred during upload: {str(e)}")
-        return None 
\ No newline at end of file
+        return None, None
+
+def apply_status_updates(youtube, update_bodies):
+    """Apply deferred privacy status updates in a single batch HTTP request.
+    
+    Args:
+        youtube: Authenticated YouTube service instance
+        update_bodies (list): Update bodies returned by upload_video
+    
+    Returns:
+        set: IDs of the videos whose status update failed
+    """
+    failed_ids = set()
+    if not update_bodies:
+        return failed_ids
+    
+    def callback(request_id, response, exception):
+        if exception is not None:
+            failed_ids.add(request_id)
+            st.warning(f"Video {request_id} uploaded but privacy status might not be set correctly: {str(exception)}")
+    
+    batch = youtube.new_batch_http_request(callback=callback)
+    for body in update_bodies:
+        batch.add(youtube.videos().update(part='status', body=body), request_id=body['id'])
+    
+    try:
+        call_youtube(batch.execute, cost=len(update_bodies))
+    except Exception as e:
+        st.warning(f"Videos uploaded but privacy statuses might not be set correctly: {str(e)}")
+        failed_ids.update(body['id'] for body in update_bodies)
+    
+    return failed_ids 
\ No newline at end of file
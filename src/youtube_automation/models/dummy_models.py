@@ -1,13 +1,19 @@
 class DummyGoogleSheets:
     def open_by_url(self, url):
-        return DummyWorksheet()
+        return DummySpreadsheet()
 
-class DummyWorksheet:
-    def sheet1(self):
-        return self
+class DummySpreadsheet:
+    def worksheets(self):
+        return []  # No worksheets in development mode
+    
+    def values_batch_get(self, ranges, params=None):
+        return {'valueRanges': []}
+    
+    def worksheet(self, title):
+        return None
     
-    def get_all_records(self):
-        return []  # Return empty list for spreadsheet mode
+    def values_append(self, range, params=None, body=None):
+        return {}
 
 class DummyYouTubeService:
     def videos(self):
@@ -15,7 +21,27 @@ class DummyYouTubeService:
     
     def insert(self, **kwargs):
         return DummyRequest()
+    
+    def update(self, **kwargs):
+        return DummyRequest()
+    
+    def new_batch_http_request(self, callback=None):
+        return DummyBatchRequest(callback)
 
 class DummyRequest:
     def execute(self):
-        return {"id": "dummy_video_id"} 
\ No newline at end of file
+        return {"id": "dummy_video_id"} 
+
+class DummyBatchRequest:
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.requests = []
+    
+    def add(self, request, request_id=None):
+        self.requests.append((request_id, request))
+    
+    def execute(self):
+        for request_id, request in self.requests:
+            response = request.execute()
+            if self.callback:
+                self.callback(request_id, response, None)
@@ -1,143 +1,354 @@
 import os
+import json
 import streamlit as st
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 import time
 import re
-import cv2
-import numpy as np
-import moviepy.editor as mpy
-from .api.youtube_api import download_video, upload_video
-from .utils.helpers import format_title, format_description, clean_filename
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from functools import lru_cache
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from .api.youtube_api import download_video, upload_video, apply_status_updates, UPLOAD_QUOTA_COST, DAILY_QUOTA
+from .utils.helpers import format_both, clean_filename
+try:
+    import re2  # google-re2: linear-time matching for user-supplied patterns
+except ImportError:
+    re2 = None
+from .utils.media import (probe_video, can_stream_copy, concat_stream_copy, concat_reencode,
+                          detect_video_encoder, scale_and_pad)
 
-def extract_pattern_match(text, pattern):
+# Number of videos processed concurrently when the config doesn't specify it
+DEFAULT_WORKERS = 4
+
+# Number of appends re-encoded at once; encoding saturates the CPU, so the
+# other workers keep downloading and uploading while these run
+ENCODE_WORKERS = 2
+
+# Minimum seconds between progress updates sent to the browser
+UI_UPDATE_INTERVAL = 0.5
+
+# Journal of uploaded videos in the output directory, used to resume batches
+RESULTS_LOG = 'results.jsonl'
+
+# Scheduled release times are entered in Eastern time
+EST = ZoneInfo('America/New_York')
+
+def _quiet(*args, **kwargs):
+    """Discard debug output when verbose logging is off."""
+
+@lru_cache(maxsize=256)
+def compile_search_pattern(pattern):
+    """Compile a search pattern, where {#} matches any number, case insensitively.
+    
+    Uses RE2 when google-re2 is installed, falling back to the standard
+    library for patterns RE2 doesn't support, such as backreferences.
+    """
+    regex = '(?i)' + pattern.replace('{#}', r'(\d+)')
+    if re2 is not None:
+        try:
+            return re2.compile(regex)
+        except re2.error:
+            pass
+    return re.compile(regex)
+
+def extract_pattern_match(text, pattern, log=st.write, first_only=False):
     """
     Extract pattern matches from text, where {#} in the pattern matches any number.
-    Returns a list of all matches found, empty list if none found.
+    The pattern may also be one already compiled with compile_search_pattern.
+    Debug output goes through log.
+    Returns a list of all matches found, or only the first with first_only,
+    empty list if none found.
     """
     if not text or not pattern:
-        st.write("❌ Text or pattern is empty")
+        log("❌ Text or pattern is empty")
         return []
     
     try:
-        # Replace {#} with regex pattern for numbers and make case insensitive
-        pattern_regex = pattern.replace('{#}', r'(\d+)')
-        st.write(f"🔍 Text to search: '{text}'")
-        st.write(f"🔍 Pattern before conversion: '{pattern}'")
-        st.write(f"🔍 Pattern after conversion: '{pattern_regex}'")
+        if isinstance(pattern, str):
+            log(f"🔍 Pattern before conversion: '{pattern}'")
+            pattern = compile_search_pattern(pattern)
+        log(f"🔍 Text to search: '{text}'")
+        log(f"🔍 Pattern after conversion: '{pattern.pattern}'")
         
-        # Case insensitive search for all matches
-        matches = re.finditer(pattern_regex, text, re.IGNORECASE)
-        found_matches = [match.group(0) for match in matches]
+        # Case insensitive search, stopping at the first match if that's all we need
+        if first_only:
+            match = pattern.search(text)
+            found_matches = [match.group(0)] if match else []
+        else:
+            found_matches = [match.group(0) for match in pattern.finditer(text)]
         
         if found_matches:
-            st.write(f"✅ Found matches: {found_matches}")
+            log(f"✅ Found matches: {found_matches}")
             return found_matches
-        st.write("❌ No matches found")
+        log("❌ No matches found")
         return []
     except Exception as e:
         st.error(f"Error in pattern matching: {str(e)}")
         return []
 
+# Video ID patterns for shorts and regular video URLs
+_SHORTS_RE = re.compile(r'/shorts/([a-zA-Z0-9_-]{11})')
+_VIDEO_RE = re.compile(r'(?:v=|/)([a-zA-Z0-9_-]{11})(?:\?|&|/|$)')
+
 def extract_video_id(url):
     """Extract video ID from YouTube URL."""
     if '/shorts/' in url:
         # Handle shorts URL format
-        match = re.search(r'/shorts/([a-zA-Z0-9_-]{11})', url)
+        match = _SHORTS_RE.search(url)
     else:
         # Handle regular video URL format
-        match = re.search(r'(?:v=|/)([a-zA-Z0-9_-]{11})(?:\?|&|/|$)', url)
+        match = _VIDEO_RE.search(url)
     
     if match:
         return match.group(1)
     return None
 
-def get_video_info(video_url, youtube_service=None):
+@st.cache_resource(show_spinner=False)
+def _get_info_ydl_pool():
+    """Return the pool of idle YoutubeDL instances used for metadata lookups."""
+    return queue.SimpleQueue()
+
+def get_video_info(video_url, youtube_service=None, log=st.write):
     """Get video title, description, and channel name from YouTube using yt-dlp."""
     try:
         import yt_dlp
-        st.write(f"📥 Fetching info for video: {video_url}")
+        log(f"📥 Fetching info for video: {video_url}")
+        
+        # Reuse an idle YoutubeDL so extractor setup and its player cache are
+        # shared across videos; each worker holds one exclusively while in use
+        pool = _get_info_ydl_pool()
+        try:
+            ydl = pool.get_nowait()
+        except queue.Empty:
+            ydl = yt_dlp.YoutubeDL({
+                'quiet': True,
+                'no_warnings': True,
+                'extract_flat': True
+            })
+        try:
+            info = ydl.extract_info(video_url, download=False)
+        finally:
+            pool.put(ydl)
         
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': True
+        video_info = {
+            'title': info.get('title', ''),
+            'description': info.get('description', ''),
+            'channel': info.get('uploader', '')  # Add channel name
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            video_info = {
-                'title': info.get('title', ''),
-                'description': info.get('description', ''),
-                'channel': info.get('uploader', '')  # Add channel name
-            }
-            
-        st.write(f"📝 Video title: '{video_info['title']}'")
-        st.write(f"📝 Channel: '{video_info['channel']}'")
-        st.write(f"📝 Video description: '{video_info['description']}'")
+        log(f"📝 Video title: '{video_info['title']}'")
+        log(f"📝 Channel: '{video_info['channel']}'")
+        log(f"📝 Video description: '{video_info['description']}'")
         return video_info
         
     except Exception as e:
         st.error(f"Could not fetch video info: {str(e)}")
         return {'title': '', 'description': '', 'channel': ''}
 
+def get_playlist_info(playlist_url):
+    """Get video info for every entry of a playlist with a single yt-dlp request.
+    
+    Returns a dict mapping video ID to the same fields as get_video_info. The
+    flat playlist listing often has no description; those are left as None so
+    callers can fetch them per video when needed.
+    """
+    try:
+        import yt_dlp
+        pool = _get_info_ydl_pool()
+        try:
+            ydl = pool.get_nowait()
+        except queue.Empty:
+            ydl = yt_dlp.YoutubeDL({
+                'quiet': True,
+                'no_warnings': True,
+                'extract_flat': True
+            })
+        try:
+            info = ydl.extract_info(playlist_url, download=False)
+        finally:
+            pool.put(ydl)
+        
+        return {
+            entry['id']: {
+                'title': entry.get('title') or '',
+                'description': entry.get('description'),
+                'channel': entry.get('uploader') or entry.get('channel') or ''
+            }
+            for entry in (info or {}).get('entries') or []
+            if entry and entry.get('id')
+        }
+    except Exception as e:
+        st.warning(f"Could not fetch playlist info, fetching each video instead: {str(e)}")
+        return {}
+
+def load_journal(results_path):
+    """Read the results journal.
+    
+    Returns a tuple (completed_urls, pending_updates): the original URLs of
+    videos already uploaded, and for those whose privacy status update was not
+    confirmed, the update body keyed by original URL.
+    """
+    completed_urls = set()
+    pending_updates = {}
+    try:
+        with open(results_path, encoding='utf-8') as results_file:
+            for line in results_file:
+                try:
+                    entry = json.loads(line)
+                    video_url = entry['Original Video URL']
+                except (ValueError, KeyError):
+                    continue  # Skip a line cut short by a crash
+                if 'Uploaded Video URL' in entry:
+                    completed_urls.add(video_url)
+                if entry.get('pending_update'):
+                    pending_updates[video_url] = entry['pending_update']
+                elif entry.get('status_update') == 'applied':
+                    pending_updates.pop(video_url, None)
+    except FileNotFoundError:
+        pass
+    return completed_urls, pending_updates
+
+def _write_journal_entry(results_file, entry):
+    """Append one entry to the results journal and flush it to disk."""
+    results_file.write(json.dumps(entry, default=str) + '\n')
+    results_file.flush()
+    os.fsync(results_file.fileno())
+
+def record_result(results_file, processed_video, pending_update=None):
+    """Journal an uploaded video, with its privacy status update if still pending."""
+    entry = dict(processed_video)
+    if pending_update:
+        entry['pending_update'] = pending_update
+    _write_journal_entry(results_file, entry)
+
+def record_status_update(results_file, video_url, applied):
+    """Journal whether the deferred privacy status update of a video was applied."""
+    _write_journal_entry(results_file, {
+        'Original Video URL': video_url,
+        'status_update': 'applied' if applied else 'failed'
+    })
+
 def process_videos(videos, youtube_service, output_dir, config):
-    """Process a list of videos according to the given configuration."""
-    processed_videos = []
-    total_videos = len(videos)
+    """Process a list of videos concurrently according to the given configuration.
+
+    Each video is downloaded, optionally appended and uploaded on a worker
+    thread. Streamlit is not thread-safe, so workers only write into their own
+    expander and report status through a queue that the main thread drains.
+    """
+    jobs = [(i, video) for i, video in enumerate(videos, 1) if video.get('youtube_url')]
+    
+    # Skip videos a previous, interrupted run already uploaded, only retrying
+    # privacy status updates that run didn't confirm
+    results_path = os.path.join(output_dir, RESULTS_LOG)
+    retried_updates = {}
+    if config.get('resume', True):
+        completed_urls, journaled_updates = load_journal(results_path)
+        skipped = sum(1 for _, video in jobs if video['youtube_url'] in completed_urls)
+        if skipped:
+            st.info(f"Skipping {skipped} videos already uploaded in a previous run (see {results_path})")
+            retried_updates = {
+                video['youtube_url']: journaled_updates[video['youtube_url']]
+                for _, video in jobs if video['youtube_url'] in journaled_updates
+            }
+            jobs = [(i, video) for i, video in jobs if video['youtube_url'] not in completed_urls]
+        if retried_updates:
+            st.info(f"Retrying the privacy status update of {len(retried_updates)} videos uploaded in a previous run")
+    total_videos = len(jobs)
+    start_number = config['template_number']
+    
+    # Uploads beyond the daily quota will fail with quotaExceeded
+    if total_videos * UPLOAD_QUOTA_COST > DAILY_QUOTA:
+        st.warning(f"Uploading {total_videos} videos needs {total_videos * UPLOAD_QUOTA_COST} quota units, "
+                   f"but the default daily YouTube API quota is {DAILY_QUOTA}. "
+                   f"Only about {DAILY_QUOTA // UPLOAD_QUOTA_COST} uploads may succeed today.")
     
     # Create progress tracking elements
     progress_bar = st.progress(0)
     status_text = st.empty()
-    time_text = st.empty()
     
-    # Initialize timing variables
-    start_time = time.time()
-    processed_count = 0
+    # Create one expander per video up front so they render in playlist order
+    expanders = [st.expander(f"Processing video {i}") for i, _ in jobs]
     
-    for i, video in enumerate(videos, 1):
-        video_url = video.get('youtube_url')
-        if not video_url:
-            continue
-        
-        # Update progress and timing information
-        progress = (i - 1) / total_videos
-        progress_bar.progress(progress)
-        
-        elapsed_time = time.time() - start_time
-        if processed_count > 0:
-            avg_time_per_video = elapsed_time / processed_count
-            remaining_videos = total_videos - i + 1
-            estimated_time = remaining_videos * avg_time_per_video
-            time_text.text(f"⏱️ Elapsed: {format_time(elapsed_time)} | Estimated remaining: {format_time(estimated_time)}")
-        else:
-            time_text.text(f"⏱️ Elapsed: {format_time(elapsed_time)} | Calculating remaining time...")
-        
-        status_text.text(f"Processing video {i} of {total_videos}: {video_url}")
+    # Worker threads need the script run context to write to Streamlit
+    ctx = get_script_run_ctx()
+    events = queue.Queue()
+    
+    # Privacy status updates collected from workers and applied in one batch,
+    # with the original URL of each video they belong to for the journal
+    pending_updates = list(retried_updates.values())
+    status_update_urls = {body['id']: video_url for video_url, body in retried_updates.items()}
+    # Uploaded video ID per job position
+    uploaded_ids = {}
+    
+    # Release times are spaced from a single start time, kept in UTC so the
+    # spacing stays exact across daylight saving changes
+    base_time = None
+    if config.get('schedule_enabled'):
+        schedule_config = config['schedule_config']
+        base_time = datetime.combine(schedule_config['start_date'], schedule_config['start_time'], tzinfo=EST)
+        base_time = base_time.astimezone(timezone.utc)
+        hours_between = schedule_config['hours_between']
+    
+    # Limits concurrent re-encodes across the workers
+    encode_slots = threading.Semaphore(ENCODE_WORKERS)
+    
+    # Snapshot the output directory once instead of checking each file
+    existing_files = {entry.name for entry in os.scandir(output_dir)} if os.path.isdir(output_dir) else set()
+    append_video_path = config.get('append_video_path')
+    if append_video_path and not os.path.exists(append_video_path):
+        append_video_path = None
+    
+    # Step-by-step debug output is only shown with verbose logging
+    verbose = config.get('verbose', False)
+    log = st.write if verbose else _quiet
+    
+    # Fetch info for all videos at once when they come from a playlist
+    playlist_info = get_playlist_info(config['source_playlist']) if config.get('source_playlist') else {}
+    
+    # Compile search patterns once for the whole batch
+    search_patterns = []
+    for pattern_config in config.get('search_patterns') or []:
+        try:
+            compiled = compile_search_pattern(pattern_config['pattern'])
+        except re.error as e:
+            st.error(f"Invalid search pattern '{pattern_config['pattern']}': {str(e)}")
+            compiled = None
+        search_patterns.append((pattern_config['pattern'], pattern_config['column_name'], compiled))
+    
+    def process_one(position, i, video):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        video_url = video['youtube_url']
+        events.put(f"Processing video {i} of {len(videos)}: {video_url}")
         
-        with st.expander(f"Processing video {i}"):
+        with expanders[position]:
             st.write(f"Video URL: {video_url}")
             
-            # Get original video info for pattern matching
-            original_video_info = get_video_info(video_url, youtube_service)
-            st.write("📥 Original video information:")
-            st.write(f"Title: {original_video_info['title']}")
-            st.write(f"Channel: {original_video_info['channel']}")
-            st.write(f"Description: {original_video_info['description']}")
+            # Get original video info for pattern matching, from the playlist
+            # listing unless a description is needed and it didn't include one
+            original_video_info = playlist_info.get(extract_video_id(video_url))
+            if original_video_info is None or (search_patterns and original_video_info['description'] is None):
+                original_video_info = get_video_info(video_url, youtube_service, log=log)
+            else:
+                original_video_info = {**original_video_info, 'description': original_video_info['description'] or ''}
+            log("📥 Original video information:")
+            log(f"Title: {original_video_info['title']}")
+            log(f"Channel: {original_video_info['channel']}")
+            log(f"Description: {original_video_info['description']}")
             
             # Format title and description for the new video
-            current_number = config['template_number']
-            title = format_title(config['title_template'], number=current_number, original_url=video_url)
-            description = format_description(config['description_template'], number=current_number, original_url=video_url)
+            current_number = start_number + position
+            title, description = format_both(
+                config['title_template'], config['description_template'],
+                number=current_number, original_url=video_url
+            )
             
             # Calculate scheduled time if enabled
             scheduled_time = None
-            if config.get('schedule_enabled'):
-                schedule_config = config['schedule_config']
-                est_tz = pytz.timezone('US/Eastern')
-                base_time = datetime.combine(schedule_config['start_date'], schedule_config['start_time'])
-                base_time = est_tz.localize(base_time)
-                scheduled_time = base_time + timedelta(hours=(i-1) * schedule_config['hours_between'])
+            if base_time is not None:
+                # Space releases in elapsed hours, then show them in Eastern time
+                scheduled_time = (base_time + timedelta(hours=(i-1) * hours_between)).astimezone(EST)
                 st.write(f"Scheduled release time (EST): {scheduled_time.strftime('%Y-%m-%d %I:%M %p')}")
             
             # Create processed_video dictionary before processing to store pattern matches
@@ -150,38 +361,46 @@ def process_videos(videos, youtube_service, output_dir, config):
             }
             
             # Add pattern matches from original video info
-            if config.get('search_patterns'):
-                st.write("🔎 Starting pattern matching process...")
-                st.write(f"📝 Original video title to search: '{original_video_info['title']}'")
+            if search_patterns:
+                log("🔎 Starting pattern matching process...")
+                log(f"📝 Original video title to search: '{original_video_info['title']}'")
                 
-                for pattern_config in config['search_patterns']:
-                    pattern = pattern_config['pattern']
-                    column_name = pattern_config['column_name']
-                    st.write(f"\n📌 Processing pattern: '{pattern}' for column: '{column_name}'")
+                for pattern, column_name, compiled in search_patterns:
+                    log(f"\n📌 Processing pattern: '{pattern}' for column: '{column_name}'")
+                    if compiled is None:
+                        processed_video[column_name] = ''
+                        continue
                     
                     # First, search in title
-                    title_matches = extract_pattern_match(original_video_info['title'], pattern)
+                    title_matches = extract_pattern_match(original_video_info['title'], compiled, log=log, first_only=True)
                     if title_matches:
                         # Use first title match if multiple found
                         match = title_matches[0]
-                        st.write(f"✅ Found match in title: '{match}' (prioritized)")
+                        log(f"✅ Found match in title: '{match}' (prioritized)")
                         processed_video[column_name] = match
-                        st.write(f"✅ Set column '{column_name}' to value: '{match}'")
+                        log(f"✅ Set column '{column_name}' to value: '{match}'")
                     else:
-                        st.write("⏳ No match in title, checking description...")
+                        log("⏳ No match in title, checking description...")
                         # If no title match, search in description
-                        desc_matches = extract_pattern_match(original_video_info['description'], pattern)
+                        desc_matches = extract_pattern_match(original_video_info['description'], compiled, log=log, first_only=True)
                         if desc_matches:
                             # Use first description match
                             match = desc_matches[0]
-                            st.write(f"✅ Found match in description: '{match}' (first match)")
+                            log(f"✅ Found match in description: '{match}' (first match)")
                             processed_video[column_name] = match
-                            st.write(f"✅ Set column '{column_name}' to value: '{match}'")
+                            log(f"✅ Set column '{column_name}' to value: '{match}'")
                         else:
                             processed_video[column_name] = ''
-                            st.write(f"❌ No matches found, set column '{column_name}' to empty string")
+                            log(f"❌ No matches found, set column '{column_name}' to empty string")
                     
-                    st.write(f"👉 Final value for column '{column_name}': '{processed_video[column_name]}'")
+                    log(f"👉 Final value for column '{column_name}': '{processed_video[column_name]}'")
+                
+                # Without verbose logging, show the pattern results in one update
+                if not verbose:
+                    st.markdown("\n".join(
+                        f"- {column_name}: `{processed_video[column_name] or 'no match'}`"
+                        for _, column_name, _ in search_patterns
+                    ))
             
             # Process the video
             success = process_single_video(
@@ -193,33 +412,111 @@ def process_videos(videos, youtube_service, output_dir, config):
                 privacy_status=config.get('privacy_status', 'private'),
                 scheduled_time=scheduled_time,
                 append_enabled=config.get('append_enabled', False),
-                append_video_path=config.get('append_video_path'),
-                video_number=i
+                append_video_path=append_video_path,
+                video_number=i,
+                pending_updates=pending_updates,
+                high_quality=config.get('high_quality', False),
+                encode_slots=encode_slots,
+                existing_files=existing_files
             )
             
             if success:
+                uploaded_ids[position] = success
                 # Update the upload URL after successful processing
                 processed_video['Uploaded Video URL'] = f"https://youtube.com/watch?v={success}" if isinstance(success, str) else 'Processing'
-                processed_videos.append(processed_video)
                 st.success(f"Successfully processed video {i}")
-                processed_count += 1
             else:
                 st.error(f"Failed to process video {i}")
                 # Still add the video to the list with error status
                 processed_video['Uploaded Video URL'] = 'Failed'
-                processed_videos.append(processed_video)
-            
-            # Increment template number
-            config['template_number'] += 1
             
             st.write(f"New Title: {title}")
             st.write(f"New Description: {description}")
+        
+        return processed_video
+    
+    # Initialize timing variables
+    start_time = time.time()
+    processed_count = 0
+    completed_count = 0
+    status = "Starting..."
+    status_text.text(f"{status}\n⏱️ Elapsed: {format_time(0)} | Calculating remaining time...")
+    last_ui_update = 0.0
+    
+    with open(results_path, 'a', encoding='utf-8') as results_file, \
+            ThreadPoolExecutor(max_workers=config.get('workers', DEFAULT_WORKERS)) as executor:
+        futures = [
+            executor.submit(process_one, position, i, video)
+            for position, (i, video) in enumerate(jobs)
+        ]
+        future_positions = {future: position for position, future in enumerate(futures)}
+        # Uploads of this run whose privacy status is still to be set
+        awaiting_status = {}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=UI_UPDATE_INTERVAL, return_when=FIRST_COMPLETED)
+            
+            # Drain status messages reported by the workers, keeping the latest
+            while not events.empty():
+                status = events.get_nowait()
+            
+            # Record uploads as they finish so a crash doesn't lose them. A
+            # pending privacy update is journaled too, so a resumed run retries
+            # just that update instead of uploading the video again.
+            completed_count += len(done)
+            updates_by_id = {body['id']: body for body in pending_updates}
+            for future in done:
+                if not future.exception() and future.result()['Uploaded Video URL'] != 'Failed':
+                    processed_count += 1
+                    processed_video = future.result()
+                    video_id = uploaded_ids.get(future_positions[future])
+                    pending_update = updates_by_id.get(video_id)
+                    record_result(results_file, processed_video, pending_update)
+                    if pending_update:
+                        awaiting_status[video_id] = processed_video
+                        status_update_urls[video_id] = processed_video['Original Video URL']
+            
+            # Throttle progress updates; each one is a websocket round trip
+            now = time.time()
+            if pending and now - last_ui_update < UI_UPDATE_INTERVAL:
+                continue
+            last_ui_update = now
+            
+            # Update progress and timing information in one element
+            progress_bar.progress(completed_count / total_videos)
+            elapsed_time = now - start_time
+            if completed_count > 0:
+                avg_time_per_video = elapsed_time / completed_count
+                estimated_time = (total_videos - completed_count) * avg_time_per_video
+                status_text.text(f"{status}\n⏱️ Elapsed: {format_time(elapsed_time)} | Estimated remaining: {format_time(estimated_time)}")
+            else:
+                status_text.text(f"{status}\n⏱️ Elapsed: {format_time(elapsed_time)} | Calculating remaining time...")
+        
+        # Apply all deferred privacy status updates in a single batch request.
+        # Failed ones stay pending in the journal and are retried on resume.
+        if pending_updates:
+            status_text.text(f"Updating privacy status for {len(pending_updates)} videos...")
+            failed_ids = apply_status_updates(youtube_service, pending_updates)
+            for video_id, video_url in status_update_urls.items():
+                record_status_update(results_file, video_url, applied=video_id not in failed_ids)
+                if video_id in failed_ids and video_id in awaiting_status:
+                    awaiting_status[video_id]['Privacy Update'] = 'Failed'
+    
+    processed_videos = []
+    for position, future in enumerate(futures):
+        if future.exception():
+            i = jobs[position][0]
+            st.error(f"Error processing video {i}: {str(future.exception())}")
+            continue
+        processed_videos.append(future.result())
+    
+    # Increment template number past the videos handed out to workers
+    config['template_number'] = start_number + total_videos
     
     # Update final progress
     progress_bar.progress(1.0)
     final_elapsed = time.time() - start_time
-    time_text.text(f"✅ Completed in {format_time(final_elapsed)} | Processed {processed_count} videos")
-    status_text.text("Processing complete!")
+    status_text.text(f"Processing complete!\n✅ Completed in {format_time(final_elapsed)} | Processed {processed_count} videos")
     
     # Make sure we have at least one processed video
     if not processed_videos:
@@ -233,191 +530,191 @@ def format_time(seconds):
     """Format time in seconds to a readable string."""
     if seconds < 60:
         return f"{seconds:.1f}s"
-    elif seconds < 3600:
-        minutes = seconds // 60
-        seconds = seconds % 60
-        return f"{int(minutes)}m {int(seconds)}s"
-    else:
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        seconds = seconds % 60
-        return f"{int(hours)}h {int(minutes)}m {int(seconds)}s"
+    hours, rem = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{hours}h {minutes}m {secs}s"
+    return f"{minutes}m {secs}s"
 
-def resize_video_opencv(input_path, output_path, target_width, target_height):
-    """Resize video using OpenCV while maintaining aspect ratio and adding black padding if needed."""
+def resize_video(input_path, output_path, target_width, target_height, high_quality=False):
+    """Resize video with ffmpeg while maintaining aspect ratio and adding black padding if needed."""
     try:
-        # Open the video file
-        cap = cv2.VideoCapture(input_path)
-        
-        # Get original video properties
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        orig_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        orig_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        
-        # Calculate scaling factor to maintain aspect ratio
-        scale_w = target_width / orig_width
-        scale_h = target_height / orig_height
-        scale = min(scale_w, scale_h)
-        
-        # Calculate new dimensions that maintain aspect ratio
-        new_width = int(orig_width * scale)
-        new_height = int(orig_height * scale)
-        
-        # Calculate padding
-        pad_left = (target_width - new_width) // 2
-        pad_top = (target_height - new_height) // 2
-        
-        # Create video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (target_width, target_height))
-        
-        # Process each frame
-        frames = []
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-                
-            # Resize frame maintaining aspect ratio
-            resized_frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LANCZOS4)
-            
-            # Create black canvas of target size
-            canvas = np.zeros((target_height, target_width, 3), dtype=np.uint8)
-            
-            # Place resized frame in center of canvas
-            canvas[pad_top:pad_top + new_height, pad_left:pad_left + new_width] = resized_frame
-            
-            frames.append(canvas)
-            out.write(canvas)
-        
-        # Release resources
-        cap.release()
-        out.release()
-        
-        # Get audio from original clip and apply to resized video
-        original_clip = mpy.VideoFileClip(input_path)
-        resized_clip = mpy.VideoFileClip(output_path)
-        
-        # Add audio to resized clip
-        final_clip = resized_clip.set_audio(original_clip.audio)
-        
-        # Save final video with audio
-        final_clip.write_videofile(
-            output_path,
-            codec='libx264',
-            audio_codec='aac',
-            temp_audiofile='temp-audio.m4a',
-            remove_temp=True
-        )
-        
-        # Clean up
-        original_clip.close()
-        resized_clip.close()
-        final_clip.close()
-        
-        return True
+        success, errors = scale_and_pad(input_path, output_path, target_width, target_height, high_quality)
+        if not success:
+            st.error(f"ffmpeg failed to resize the video: {errors}")
+        return success
     except Exception as e:
-        st.error(f"Error in resize_video_opencv: {str(e)}")
+        st.error(f"Error in resize_video: {str(e)}")
         return False
 
+def _video_size(path, info):
+    """Get a video's dimensions from its ffprobe info, or by opening it with MoviePy."""
+    if info is not None:
+        return info['width'], info['height']
+    import moviepy.editor as mpy
+    clip = mpy.VideoFileClip(path)
+    size = clip.size
+    clip.close()
+    return size
+
+def append_video_moviepy(video_path, append_video_path, final_path, output_dir, video_filename, video_number,
+                         video_info=None, append_info=None, high_quality=False):
+    """Append a video by re-encoding both clips with MoviePy, resizing the appended one if needed.
+    
+    video_info and append_info are the optional probe_video results for the two
+    videos, used to avoid opening them just to read their dimensions.
+    """
+    # MoviePy is slow to import and only used on this fallback path
+    import moviepy.editor as mpy
+    
+    main_width, main_height = _video_size(video_path, video_info)
+    append_width, append_height = _video_size(append_video_path, append_info)
+    original_append_path = append_video_path
+    
+    st.write(f"Main video resolution: {main_width}x{main_height}")
+    st.write(f"Append video resolution: {append_width}x{append_height}")
+    
+    # Resize append video if resolutions don't match
+    if main_width != append_width or main_height != append_height:
+        st.write(f"Resizing append video to match main video resolution: {main_width}x{main_height}")
+        resized_append_path = os.path.join(output_dir, f"resized_append_{video_filename}")
+        
+        # Resize using ffmpeg
+        if not resize_video(append_video_path, resized_append_path, main_width, main_height, high_quality):
+            st.error("Failed to resize append video")
+            return False
+        
+        append_video_path = resized_append_path
+    
+    # Load videos for concatenation
+    main_clip = mpy.VideoFileClip(video_path)
+    append_clip = mpy.VideoFileClip(append_video_path)
+    
+    # Concatenate videos
+    final_clip = mpy.concatenate_videoclips([main_clip, append_clip])
+    
+    # Save the final video, on a hardware encoder when one is available
+    encoder, encoder_params = detect_video_encoder()
+    st.write(f"Saving final video with {encoder}...")
+    final_clip.write_videofile(
+        final_path,
+        codec=encoder,
+        ffmpeg_params=list(encoder_params),
+        audio_codec='aac',
+        temp_audiofile=os.path.join(output_dir, f"temp-audio_{video_number}.m4a"),  # Unique per video for parallel workers
+        remove_temp=True
+    )
+    
+    # Close clips
+    main_clip.close()
+    append_clip.close()
+    final_clip.close()
+    
+    # The resized copy is only needed for this video
+    if append_video_path != original_append_path:
+        os.remove(append_video_path)
+    return True
+
 def process_single_video(video_url, output_dir, youtube_service, title, description, 
                         privacy_status="private", scheduled_time=None, append_enabled=False, 
-                        append_video_path=None, video_number=1):
-    """Process a single video including download, append, and upload."""
+                        append_video_path=None, video_number=1, pending_updates=None,
+                        high_quality=False, encode_slots=None, existing_files=None):
+    """Process a single video including download, append, and upload.
+    
+    If pending_updates is a list, privacy status updates are appended to it
+    instead of being applied immediately. If encode_slots is a semaphore, the
+    append step holds it while joining videos. existing_files is an optional
+    snapshot of the file names in output_dir, used to find earlier downloads
+    without stat calls.
+    """
     try:
         # Download video
         video_filename = clean_filename(f"video_{video_number}.mp4")
-        video_path = os.path.join(output_dir, video_filename)
         
-        if not os.path.exists(video_path):
-            video_path = download_video(video_url, output_dir)
-            if not video_path:
-                return False
-            
-            # Append video if enabled
-            if append_enabled and append_video_path and os.path.exists(append_video_path):
-                try:
-                    st.write("Appending video...")
-                    # Load main video to get dimensions
-                    main_clip = mpy.VideoFileClip(video_path)
-                    main_width, main_height = main_clip.size
-                    main_clip.close()
-                    
-                    # Load append video to get dimensions
-                    append_clip = mpy.VideoFileClip(append_video_path)
-                    append_width, append_height = append_clip.size
-                    append_clip.close()
-                    
-                    st.write(f"Main video resolution: {main_width}x{main_height}")
-                    st.write(f"Append video resolution: {append_width}x{append_height}")
-                    
-                    # Resize append video if resolutions don't match
-                    if main_width != append_width or main_height != append_height:
-                        st.write(f"Resizing append video to match main video resolution: {main_width}x{main_height}")
-                        resized_append_path = os.path.join(output_dir, f"resized_append_{video_filename}")
-                        
-                        # Resize using OpenCV
-                        if not resize_video_opencv(append_video_path, resized_append_path, main_width, main_height):
-                            st.error("Failed to resize append video")
-                            return False
-                        
-                        append_video_path = resized_append_path
-                    
-                    # Load videos for concatenation
-                    main_clip = mpy.VideoFileClip(video_path)
-                    append_clip = mpy.VideoFileClip(append_video_path)
-                    
-                    # Concatenate videos
-                    final_clip = mpy.concatenate_videoclips([main_clip, append_clip])
-                    
-                    # Save the final video
-                    final_path = os.path.join(output_dir, f"final_{video_filename}")
-                    st.write("Saving final video...")
-                    final_clip.write_videofile(
-                        final_path,
-                        codec='libx264',
-                        audio_codec='aac',
-                        temp_audiofile='temp-audio.m4a',
-                        remove_temp=True
-                    )
-                    
-                    # Close clips
-                    main_clip.close()
-                    append_clip.close()
-                    final_clip.close()
-                    
-                    # Update video path to the concatenated version
-                    video_path = final_path
-                    st.success("Video appended successfully!")
-                    
-                except Exception as e:
-                    st.error(f"Error appending video: {str(e)}")
+        # Previous downloads of the same video are reused by download_video
+        video_path = download_video(video_url, output_dir, high_quality=high_quality,
+                                    existing_files=existing_files)
+        if not video_path:
+            return False
+        downloaded_path = video_path
+        
+        # Append video if enabled
+        if append_enabled and append_video_path and os.path.exists(append_video_path):
+            if encode_slots is not None:
+                st.write("Waiting for a free encode slot...")
+                encode_slots.acquire()
+            try:
+                st.write("Appending video...")
+                final_path = os.path.join(output_dir, f"final_{video_filename}")
+                
+                # Join without re-encoding when both videos share the same formats
+                appended = False
+                video_info = probe_video(video_path)
+                append_info = probe_video(append_video_path)
+                if can_stream_copy(video_info, append_info):
+                    st.write("Video formats match, joining without re-encoding...")
+                    appended = concat_stream_copy([video_path, append_video_path], final_path)
+                    if not appended:
+                        st.warning("Joining without re-encoding failed, re-encoding instead...")
+                
+                # Otherwise scale and join in a single ffmpeg pass
+                if (not appended and video_info and append_info
+                        and video_info['audio_codec'] and append_info['audio_codec']):
+                    st.write(f"Re-encoding to {video_info['width']}x{video_info['height']} with ffmpeg...")
+                    appended = concat_reencode(video_path, append_video_path, final_path,
+                                               video_info, append_info)
+                    if not appended:
+                        st.warning("ffmpeg re-encode failed, falling back to MoviePy...")
+                
+                if not appended and not append_video_moviepy(video_path, append_video_path, final_path,
+                                                             output_dir, video_filename, video_number,
+                                                             video_info, append_info, high_quality):
                     return False
-            
-            # Upload video
-            st.write("Uploading video...")
-            
-            # Set privacy status based on scheduling
-            if scheduled_time:
-                st.write("Setting up scheduled publish...")
-                upload_privacy_status = "scheduled"
-            else:
-                upload_privacy_status = privacy_status
-            
-            video_id = upload_video(
-                youtube_service, 
-                video_path, 
-                title, 
-                description, 
-                privacy_status=upload_privacy_status,
-                scheduled_time=scheduled_time
-            )
-            if not video_id:
+                
+                # Update video path to the concatenated version
+                video_path = final_path
+                st.success("Video appended successfully!")
+                
+            except Exception as e:
+                st.error(f"Error appending video: {str(e)}")
                 return False
-            return video_id
+            finally:
+                if encode_slots is not None:
+                    encode_slots.release()
         
-        return False
+        # Upload video
+        st.write("Uploading video...")
+        
+        # Set privacy status based on scheduling
+        if scheduled_time:
+            st.write("Setting up scheduled publish...")
+            upload_privacy_status = "scheduled"
+        else:
+            upload_privacy_status = privacy_status
+        
+        video_id, pending_update = upload_video(
+            youtube_service, 
+            video_path, 
+            title, 
+            description, 
+            privacy_status=upload_privacy_status,
+            scheduled_time=scheduled_time
+        )
+        if not video_id:
+            return False
+        
+        # The joined video is only an upload intermediate; the download is
+        # kept so reruns can reuse it
+        if video_path != downloaded_path:
+            os.remove(video_path)
+        
+        # Defer the privacy status update so the caller can batch them
+        if pending_update:
+            if pending_updates is not None:
+                pending_updates.append(pending_update)
+            else:
+                apply_status_updates(youtube_service, [pending_update])
+        return video_id
     except Exception as e:
         st.error(f"Error processing video: {str(e)}")
         return False 
\ No newline at end of file
@@ -1,15 +1,15 @@
 import os
 import re
+import threading
 import requests
 import streamlit as st
-from google_auth_oauthlib.flow import Flow
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-import webbrowser
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
 from ..models.dummy_models import DummyGoogleSheets, DummyYouTubeService
 
 # Google Sheets API setup
@@ -20,12 +20,85 @@ SCOPES = [
     'https://www.googleapis.com/auth/youtube.force-ssl'
 ]
 
+# Worksheet that processing results are written back to
+RESULTS_WORKSHEET = 'Results'
+
+# On-disk cache used by httplib2 for conditional GETs
+HTTP_CACHE_DIR = '.httpcache'
+
+# Playlist ID in a playlist URL, and video IDs linked from a playlist page
+_PLAYLIST_ID_RE = re.compile(r'list=([^&]+)')
+_PLAYLIST_VIDEO_ID_RE = re.compile(rb'(?:watch\?v=|/shorts/)([a-zA-Z0-9_-]{11})')
+
+# Bytes carried over between streamed chunks, one less than the longest match
+_PLAYLIST_CHUNK_OVERLAP = len(b'/shorts/') + 11 - 1
+
+# Shared session so repeated page fetches reuse pooled connections
+_http_session = requests.Session()
+_http_session.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=16,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+))
+
+def _orjson_model():
+    """Create a JsonModel that decodes API responses with orjson."""
+    from googleapiclient.model import JsonModel
+    
+    class OrjsonModel(JsonModel):
+        """JsonModel that decodes API responses with orjson.
+        
+        Request bodies keep the stock serializer: it escapes non-ASCII text,
+        whereas orjson emits raw UTF-8 that http.client would encode as latin-1.
+        """
+    
+        def deserialize(self, content):
+            try:
+                body = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                return content.decode('utf-8') if isinstance(content, bytes) else content
+            if self._data_wrapper and 'data' in body:
+                body = body['data']
+            return body
+    
+    return OrjsonModel()
+
+def _thread_local_http(credentials):
+    """Create a request builder that reuses one authorized connection per thread.
+    
+    httplib2.Http is not thread-safe, so every worker thread gets its own
+    connection, which is then kept alive across all of that thread's requests.
+    """
+    import httplib2
+    import google_auth_httplib2
+    from googleapiclient.http import HttpRequest
+    
+    local = threading.local()
+    
+    def get_http():
+        if not hasattr(local, 'http'):
+            local.http = google_auth_httplib2.AuthorizedHttp(
+                credentials,
+                http=httplib2.Http(cache=HTTP_CACHE_DIR)
+            )
+        return local.http
+    
+    def build_request(http, *args, **kwargs):
+        return HttpRequest(get_http(), *args, **kwargs)
+    
+    return get_http, build_request
+
+@st.cache_resource(show_spinner=False)
 def setup_google_sheets(dev_mode=True):
     if dev_mode:
         st.warning("⚠️ Running in development mode - Google Sheets integration is mocked")
         return DummyGoogleSheets()
     
     try:
+        # Imported here so development mode never loads the Sheets client libraries
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        
         creds = ServiceAccountCredentials.from_json_keyfile_name(
             'credentials.json', 
             ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
@@ -39,46 +112,95 @@ def setup_google_sheets(dev_mode=True):
         raise
 
 def get_youtube_service(dev_mode=True):
-    """Get an authenticated YouTube service instance using manual credentials."""
+    """Get an authenticated YouTube service instance using manual credentials.
+    
+    Only the real client is cached, so the mock returned in development mode
+    or without client_secrets.json is never reused once the file is added.
+    """
     if dev_mode:
         st.warning("⚠️ Running in development mode - YouTube integration is mocked")
         return DummyYouTubeService()
     
+    if not os.path.exists('client_secrets.json'):
+        st.error("❌ Missing client_secrets.json file.")
+        return DummyYouTubeService()
+    
     try:
-        if not os.path.exists('client_secrets.json'):
-            st.error("❌ Missing client_secrets.json file.")
-            return DummyYouTubeService()
+        return _build_youtube_service()
+    except Exception as e:
+        st.error(f"Error setting up YouTube service: {str(e)}")
+        raise
 
-        # Load credentials from client_secrets.json
-        with open('client_secrets.json', 'r') as f:
-            client_config = json.load(f)
-            
-        # Create credentials object
-        credentials = Credentials(
-            token=client_config.get('access_token'),
-            refresh_token=client_config.get('refresh_token'),
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=client_config['web']['client_id'],
-            client_secret=client_config['web']['client_secret'],
-            scopes=SCOPES
-        )
+@st.cache_resource(show_spinner=False)
+def _build_youtube_service():
+    """Build the YouTube client from client_secrets.json; errors are raised, not cached."""
+    # Imported here so development mode never loads the auth and discovery clients
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+    
+    # Load credentials from client_secrets.json
+    with open('client_secrets.json', 'r') as f:
+        client_config = json.load(f)
         
-        # Refresh the token if needed
-        if credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
-            
-            # Update the access token in client_secrets.json
-            client_config['access_token'] = credentials.token
-            with open('client_secrets.json', 'w') as f:
-                json.dump(client_config, f, indent=2)
+    # Create credentials object
+    credentials = Credentials(
+        token=client_config.get('access_token'),
+        refresh_token=client_config.get('refresh_token'),
+        token_uri="https://oauth2.googleapis.com/token",
+        client_id=client_config['web']['client_id'],
+        client_secret=client_config['web']['client_secret'],
+        scopes=SCOPES
+    )
+    
+    # Refresh the token if needed
+    if credentials.expired and credentials.refresh_token:
+        credentials.refresh(Request())
+        
+        # Update the access token in client_secrets.json
+        client_config['access_token'] = credentials.token
+        with open('client_secrets.json', 'w') as f:
+            json.dump(client_config, f, indent=2)
 
-        return build('youtube', 'v3', credentials=credentials)
+    get_http, build_request = _thread_local_http(credentials)
+    return build(
+        'youtube',
+        'v3',
+        http=get_http(),
+        requestBuilder=build_request,
+        cache_discovery=False,
+        static_discovery=True,  # Use the discovery document bundled with the client library
+        model=_orjson_model() if orjson else None
+    )
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _scan_playlist_video_ids(playlist_id):
+    """Return the unique video IDs linked from a playlist page, in page order.
     
-    except Exception as e:
-        st.error(f"Error setting up YouTube service: {str(e)}")
-        if dev_mode:
-            return DummyYouTubeService()
-        raise
+    Errors are raised rather than cached, so a failed fetch is retried on the
+    next call instead of returning no videos for the rest of the minute.
+    """
+    # Make direct request to get playlist data
+    playlist_api_url = f'https://www.youtube.com/playlist?list={playlist_id}'
+    response = _http_session.get(playlist_api_url, stream=True)
+    response.raise_for_status()
+    
+    # Extract unique video IDs in page order, scanning the raw bytes
+    # as they stream in so the page is never held or decoded whole.
+    # The tail of each chunk is rescanned with the next one to catch
+    # IDs split across chunks; the seen set drops the repeats.
+    seen = set()
+    video_ids = []
+    tail = b''
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        buffer = tail + chunk
+        for match in _PLAYLIST_VIDEO_ID_RE.finditer(buffer):
+            video_id = match.group(1)
+            if video_id not in seen:
+                seen.add(video_id)
+                video_ids.append(video_id.decode('ascii'))
+        tail = buffer[-_PLAYLIST_CHUNK_OVERLAP:]
+    return video_ids
 
 def get_playlist_videos(playlist_url):
     try:
@@ -86,18 +208,11 @@ def get_playlist_videos(playlist_url):
             # This is a playlist
             try:
                 # Extract playlist ID
-                playlist_id = re.search(r'list=([^&]+)', playlist_url).group(1)
+                playlist_id = _PLAYLIST_ID_RE.search(playlist_url).group(1)
                 st.write(f"Playlist ID: {playlist_id}")
                 
-                # Make direct request to get playlist data
-                playlist_api_url = f'https://www.youtube.com/playlist?list={playlist_id}'
-                response = requests.get(playlist_api_url)
-                html_content = response.text
-                
-                # Extract video IDs using regex
-                video_ids = re.findall(r'(?:watch\?v=|/shorts/)([a-zA-Z0-9_-]{11})', html_content)
-                video_ids = list(dict.fromkeys(video_ids))  # Remove duplicates
-                
+                # Page scans are cached for a minute
+                video_ids = _scan_playlist_video_ids(playlist_id)
                 st.write(f"Found {len(video_ids)} unique videos")
                 
                 # Convert to shorts format
@@ -136,10 +251,69 @@ def get_playlist_videos(playlist_url):
         st.write("Full error details:", str(e))
         return []
 
+@st.cache_data(ttl=60, show_spinner=False)
+def _read_spreadsheet_videos(_sheets_client, spreadsheet_url):
+    """Read the video rows from the first worksheet of the spreadsheet.
+    
+    Only that worksheet's range is requested, with a single values.batchGet
+    call. Errors are raised rather than cached.
+    """
+    # The leading underscore keeps the unhashable client out of the cache key
+    import gspread
+    spreadsheet = _sheets_client.open_by_url(spreadsheet_url)
+    worksheets = spreadsheet.worksheets()
+    if not worksheets:
+        return []
+    
+    first_range = "'{}'".format(worksheets[0].title.replace("'", "''"))
+    response = spreadsheet.values_batch_get([first_range])
+    value_ranges = response.get('valueRanges', [])
+    values = value_ranges[0].get('values', []) if value_ranges else []
+    if not values:
+        return []
+    headers = values[0]
+    records = []
+    for row in values[1:]:
+        row = row + [''] * (len(headers) - len(row))
+        records.append(dict(zip(headers, gspread.utils.numericise_all(row[:len(headers)]))))
+    return records
+
 def get_spreadsheet_videos(sheets_client, spreadsheet_url):
+    """Read the video rows of a spreadsheet; reads are cached for a minute."""
     try:
-        worksheet = sheets_client.open_by_url(spreadsheet_url).sheet1
-        return worksheet.get_all_records()
+        return _read_spreadsheet_videos(sheets_client, spreadsheet_url)
     except Exception as e:
         st.error(f"Error accessing spreadsheet: {str(e)}")
-        return [] 
\ No newline at end of file
+        return []
+
+def clear_video_caches():
+    """Forget cached playlist and spreadsheet reads so the next ones fetch fresh data."""
+    _scan_playlist_video_ids.clear()
+    _read_spreadsheet_videos.clear()
+
+def append_results_to_spreadsheet(sheets_client, spreadsheet_url, processed_videos, columns):
+    """Append the processing results to the Results worksheet in a single request.
+    
+    The worksheet is created with a header row on first use.
+    """
+    try:
+        import gspread
+        spreadsheet = sheets_client.open_by_url(spreadsheet_url)
+        rows = []
+        try:
+            spreadsheet.worksheet(RESULTS_WORKSHEET)
+        except gspread.exceptions.WorksheetNotFound:
+            spreadsheet.add_worksheet(RESULTS_WORKSHEET, rows=1, cols=len(columns))
+            rows.append(list(columns))
+        
+        rows.extend([video.get(column, '') for column in columns] for video in processed_videos)
+        spreadsheet.values_append(
+            f"'{RESULTS_WORKSHEET}'!A1",
+            params={'valueInputOption': 'RAW'},
+            body={'values': rows}
+        )
+        st.success(f"Wrote {len(processed_videos)} results to the '{RESULTS_WORKSHEET}' worksheet")
+        return True
+    except Exception as e:
+        st.error(f"Error writing results to spreadsheet: {str(e)}")
+        return False
@@ -1,51 +1,174 @@
 import os
 import json
+import threading
 import streamlit as st
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
 
 TEMPLATES_FILE = 'templates.json'
 
+# Seconds to wait before writing template changes, so a burst of edits
+# results in a single write
+FLUSH_DELAY = 0.5
+
+_flush_lock = threading.Lock()
+_flush_timer = None
+# Save/delete operations not yet written, shared by every session
+_pending_ops = []
+# Bumped for every queued operation so sessions rebuild their view
+_ops_version = 0
+
+@st.cache_data(max_entries=1, show_spinner=False)
+def _read_templates(mtime):
+    """Parse the templates.json file.
+    
+    mtime is only part of the cache key, so the file is read again once it has
+    been modified. Each caller gets its own copy and may change it freely.
+    """
+    return _parse_templates_file()
+
+def _parse_templates_file():
+    """Read and parse templates.json without going through the cache."""
+    # Both parsers take the raw bytes, skipping text-mode decoding
+    with open(TEMPLATES_FILE, 'rb') as f:
+        content = f.read()
+    if orjson:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def _templates_mtime():
+    """Modification time of templates.json, or None if it doesn't exist."""
+    try:
+        return os.stat(TEMPLATES_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+def _apply_op(templates, index, op):
+    """Apply one queued ('save', name, title, description) or ('delete', name) operation."""
+    if op[0] == 'save':
+        _, name, title_template, description_template = op
+        # Check if template with this name already exists
+        existing_template = index.get(name)
+        if existing_template:
+            # Update existing template
+            existing_template['title'] = title_template
+            existing_template['description'] = description_template
+        else:
+            # Add new template
+            template = {
+                'name': name,
+                'title': title_template,
+                'description': description_template
+            }
+            templates['templates'].append(template)
+            index[name] = template
+    elif op[0] == 'delete':
+        name = op[1]
+        if index.pop(name, None) is not None:
+            templates['templates'] = [t for t in templates['templates'] if t['name'] != name]
+
 def load_templates():
-    """Load templates from the templates.json file."""
-    if os.path.exists(TEMPLATES_FILE):
+    """Load templates from the templates.json file.
+    
+    Operations still waiting to be written are applied on top, so a saved
+    template shows up right away. The result is kept in session state and
+    reused until the file changes or another operation is queued.
+    """
+    with _flush_lock:
+        key = (_templates_mtime(), _ops_version)
+        cached = st.session_state.get('_templates_cache')
+        if cached is not None and cached[0] == key:
+            return cached[1]
         try:
-            with open(TEMPLATES_FILE, 'r') as f:
-                return json.load(f)
+            templates = _read_templates(key[0])
         except:
-            return {'templates': []}
-    return {'templates': []}
+            templates = {'templates': []}
+        # Name -> template lookup, kept in session state so it is never written to disk
+        index = {t['name']: t for t in templates['templates']}
+        for op in _pending_ops:
+            _apply_op(templates, index, op)
+    st.session_state['_templates_cache'] = (key, templates)
+    st.session_state['_templates_index'] = index
+    return templates
 
-def save_template(name, title_template, description_template):
-    """Save a new template to the templates.json file."""
-    templates = load_templates()
-    
-    # Check if template with this name already exists
-    existing_template = next((t for t in templates['templates'] if t['name'] == name), None)
-    if existing_template:
-        # Update existing template
-        existing_template['title'] = title_template
-        existing_template['description'] = description_template
+def _template_index():
+    """Return the name -> template index for the session's templates."""
+    load_templates()
+    return st.session_state['_templates_index']
+
+def _write_templates(templates):
+    """Write templates to the templates.json file."""
+    # Write a temp file and rename it, so readers never see a partial file
+    tmp_path = TEMPLATES_FILE + '.tmp'
+    if orjson:
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(templates, option=orjson.OPT_INDENT_2))
     else:
-        # Add new template
-        templates['templates'].append({
-            'name': name,
-            'title': title_template,
-            'description': description_template
-        })
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(templates, f, indent=2)
+    os.replace(tmp_path, TEMPLATES_FILE)
+    _read_templates.clear()
+
+def _flush():
+    """Apply the queued operations to the current file and write it once.
     
-    with open(TEMPLATES_FILE, 'w') as f:
-        json.dump(templates, f, indent=2)
+    Must be called with _flush_lock held.
+    """
+    global _pending_ops
+    if not _pending_ops:
+        return
+    ops, _pending_ops = _pending_ops, []
+    try:
+        templates = _parse_templates_file()
+    except:
+        templates = {'templates': []}
+    index = {t['name']: t for t in templates['templates']}
+    for op in ops:
+        _apply_op(templates, index, op)
+    _write_templates(templates)
+
+def _schedule_flush(op):
+    """Queue an operation and write all queued ones after FLUSH_DELAY."""
+    global _flush_timer, _ops_version
+    with _flush_lock:
+        _pending_ops.append(op)
+        _ops_version += 1
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+        _flush_timer = threading.Timer(FLUSH_DELAY, _flush_pending)
+        _flush_timer.start()
+
+def _flush_pending():
+    """Timer callback writing the queued operations, unless a newer timer replaced it."""
+    global _flush_timer
+    with _flush_lock:
+        if _flush_timer is not threading.current_thread():
+            return
+        _flush_timer = None
+        _flush()
+
+def flush_templates():
+    """Write queued template changes now instead of waiting for the timer."""
+    global _flush_timer
+    with _flush_lock:
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+        _flush()
+
+def save_template(name, title_template, description_template):
+    """Save a new template; it is written to the templates.json file shortly after."""
+    _schedule_flush(('save', name, title_template, description_template))
 
 def delete_template(name):
-    """Delete a template from the templates.json file."""
-    templates = load_templates()
-    templates['templates'] = [t for t in templates['templates'] if t['name'] != name]
-    with open(TEMPLATES_FILE, 'w') as f:
-        json.dump(templates, f, indent=2)
+    """Delete a template; the templates.json file is updated shortly after."""
+    _schedule_flush(('delete', name))
 
 def load_template_callback(template_name):
     """Callback function for loading a template."""
-    templates = load_templates()
-    template = next(t for t in templates['templates'] if t['name'] == template_name)
+    template = _template_index()[template_name]
     st.session_state.title_template_input = template['title']
     st.session_state.description_template_input = template['description']
 
@@ -94,4 +217,8 @@ def render_template_manager():
                 if st.button("Delete", key="delete_template_button"):
                     delete_template(selected_template)
                     st.success(f"Template '{selected_template}' deleted!")
-                    st.rerun() 
\ No newline at end of file
+                    st.rerun()
+    
+    if st.button("Flush now", key="flush_templates_button", help="Write template changes to templates.json immediately"):
+        flush_templates()
+        st.success("Templates written to disk!") 
\ No newline at end of file
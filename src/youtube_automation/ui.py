@@ -1,11 +1,28 @@
 import streamlit as st
-from datetime import datetime
-import pytz
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
 import os
+import shutil
+import hashlib
+import uuid
 
 # Configure the Streamlit page
 st.set_page_config(page_title="YouTube Shorts Automation", page_icon="🎥")
 
+# Release dates and times are entered in Eastern time
+_EASTERN = ZoneInfo('America/New_York')
+
+# Bytes hashed from each end of an upload to fingerprint it
+_FINGERPRINT_CHUNK = 64 * 1024
+
+# Uploaded append videos are kept with the downloads, and removed once no
+# session has used them for this many seconds
+APPEND_DIR = 'downloads'
+APPEND_MAX_AGE = 24 * 60 * 60
+
+# Release time choices in 30-minute intervals
+_TIME_OPTIONS = tuple(time(hour, minute) for hour in range(24) for minute in (0, 30))
+
 def initialize_session_state():
     """Initialize session state variables."""
     if 'dev_mode' not in st.session_state:
@@ -83,6 +100,27 @@ def render_template_section():
         'template_number': template_number
     }
 
+def _upload_fingerprint(uploaded_file):
+    """Cheap fingerprint of an upload: a hash of its size and both ends."""
+    data = uploaded_file.getbuffer()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(len(data).to_bytes(8, 'little'))
+    digest.update(data[:_FINGERPRINT_CHUNK])
+    digest.update(data[-_FINGERPRINT_CHUNK:])
+    return digest.hexdigest()
+
+def _remove_stale_append_videos(keep_path):
+    """Delete append videos in APPEND_DIR not used within APPEND_MAX_AGE."""
+    cutoff = datetime.now().timestamp() - APPEND_MAX_AGE
+    for entry in os.scandir(APPEND_DIR):
+        if (entry.name.startswith('append_') and entry.name.endswith('.mp4')
+                and entry.path != keep_path):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass  # Already removed by another session
+
 def render_append_section():
     """Render the video append configuration section."""
     append_enabled = st.checkbox("Append video to downloads", value=False)
@@ -95,9 +133,27 @@ def render_append_section():
             help="This video will be appended to the end of each downloaded video"
         )
         if append_video:
-            append_video_path = "append_video.mp4"
-            with open(append_video_path, "wb") as f:
-                f.write(append_video.getbuffer())
+            # Each distinct upload gets its own file, so sessions appending
+            # different videos never overwrite each other's, and reruns with
+            # the same upload still in the widget find it already written
+            os.makedirs(APPEND_DIR, exist_ok=True)
+            append_video_path = os.path.join(APPEND_DIR, f"append_{_upload_fingerprint(append_video)}.mp4")
+            if os.path.exists(append_video_path):
+                # Mark it as still in use so it isn't removed as stale
+                os.utime(append_video_path)
+            else:
+                # Stream the upload to a temp file in 1 MiB chunks, then rename it
+                # into place so readers never see a partially written video
+                tmp_path = f"{append_video_path}.{uuid.uuid4().hex}.tmp"
+                try:
+                    append_video.seek(0)
+                    with open(tmp_path, "wb") as f:
+                        shutil.copyfileobj(append_video, f, length=1 << 20)
+                    os.replace(tmp_path, append_video_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                _remove_stale_append_videos(append_video_path)
             st.success("Append video uploaded successfully!")
 
     return {
@@ -124,22 +180,16 @@ def render_schedule_section():
         with col1:
             start_date = st.date_input(
                 "Start Date",
-                value=datetime.now(pytz.timezone('US/Eastern')).date(),
+                value=datetime.now(_EASTERN).date(),
                 help="Select the start date for video releases (EST)"
             )
         with col2:
-            # Create a list of time options in 30-minute intervals
-            time_options = []
-            for hour in range(24):
-                for minute in [0, 30]:
-                    time_options.append(datetime.strptime(f"{hour:02d}:{minute:02d}", "%H:%M").time())
-            
             # Default to midnight (00:00)
             default_time_index = 0  # Index for 00:00
             
             start_time = st.selectbox(
                 "Release Time (EST)",
-                options=time_options,
+                options=_TIME_OPTIONS,
                 format_func=lambda x: x.strftime("%I:%M %p"),  # Format as "HH:MM AM/PM"
                 index=default_time_index,
                 help="Select the time for video releases (EST). Times are shown in 30-minute intervals."
@@ -174,13 +224,14 @@ def render_pattern_search_section():
     if 'search_patterns' not in st.session_state:
         st.session_state.search_patterns = []
     
-    # Add pattern button
+    # Add pattern button; the new row is rendered below in this same run
     if st.button("Add Pattern"):
         st.session_state.search_patterns.append({"pattern": "", "column_name": ""})
-        st.rerun()
     
-    # Pattern inputs
+    # Pattern inputs; edits are collected locally and written back once
     patterns_to_remove = []
+    new_state = []
+    dirty = False
     for i, pattern_dict in enumerate(st.session_state.search_patterns):
         col1, col2, col3 = st.columns([3, 3, 1])
         with col1:
@@ -206,23 +257,64 @@ def render_pattern_search_section():
                 "pattern": pattern,
                 "column_name": column_name
             })
-            # Update session state
-            st.session_state.search_patterns[i]["pattern"] = pattern
-            st.session_state.search_patterns[i]["column_name"] = column_name
+            if (pattern_dict.get("pattern") != pattern
+                    or pattern_dict.get("column_name") != column_name):
+                pattern_dict = {"pattern": pattern, "column_name": column_name}
+                dirty = True
+        new_state.append(pattern_dict)
     
     # Remove patterns marked for deletion
     for i in reversed(patterns_to_remove):
-        st.session_state.search_patterns.pop(i)
+        new_state.pop(i)
+    
+    # Update session state only when something changed, then rerun once to redraw the rows
+    if dirty or patterns_to_remove:
+        st.session_state.search_patterns = new_state
+    if patterns_to_remove:
         st.rerun()
     
     return patterns
 
+def render_processing_section():
+    """Render the processing performance configuration section."""
+    st.subheader("Processing Options")
+    workers = st.number_input(
+        "Parallel videos",
+        min_value=1,
+        max_value=16,
+        value=4,
+        help="Number of videos downloaded and uploaded at the same time"
+    )
+    high_quality = st.checkbox(
+        "High quality",
+        value=False,
+        help="Merge the best separate video and audio streams and resize appended videos with the Lanczos filter. Slower, as every download is remuxed with ffmpeg."
+    )
+    resume = st.checkbox(
+        "Skip already uploaded videos",
+        value=True,
+        help="Skip videos recorded as uploaded in downloads/results.jsonl, e.g. after an interrupted run"
+    )
+    verbose = st.checkbox(
+        "Verbose logging",
+        value=False,
+        help="Show step-by-step video info and pattern matching details for each video"
+    )
+
+    return {
+        'workers': workers,
+        'high_quality': high_quality,
+        'resume': resume,
+        'verbose': verbose
+    }
+
 def get_processing_config():
     """Get the complete processing configuration."""
     template_config = render_template_section()
     append_config = render_append_section()
     schedule_config = render_schedule_section()
     pattern_config = render_pattern_search_section()
+    processing_config = render_processing_section()
 
     return {
         'title_template': template_config['title_template'],
@@ -233,5 +325,9 @@ def get_processing_config():
         'schedule_enabled': schedule_config['schedule_config'] is not None,
         'schedule_config': schedule_config['schedule_config'],
         'search_patterns': pattern_config,
-        'privacy_status': schedule_config['privacy_status']
+        'privacy_status': schedule_config['privacy_status'],
+        'workers': processing_config['workers'],
+        'high_quality': processing_config['high_quality'],
+        'resume': processing_config['resume'],
+        'verbose': processing_config['verbose']
     } 
\ No newline at end of file
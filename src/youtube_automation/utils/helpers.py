@@ -1,44 +1,78 @@
 import os
 import re
+from functools import lru_cache
 import streamlit as st
 
-def format_title(template, number=None, original_url=None):
-    """Format the title template with provided variables."""
-    title = template
+# Compiled once at import; validate_url runs on every Streamlit rerun
+_YT_URL_RE = re.compile(r'(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+')
+# Deletion table for characters not allowed in filenames on Windows and POSIX
+_FN_DELETE = str.maketrans('', '', '<>:"/\\|?*')
+
+# Template placeholders, substituted in a single pass over the template
+_PLACEHOLDER_RE = re.compile(r'\{(number|originalUrl)\}')
+
+def _substitutions(number, original_url):
+    """Build the placeholder mapping shared by the template formatters."""
+    subs = {}
     if number is not None:
-        title = title.replace('{number}', str(number))
+        subs['number'] = str(number)
     if original_url is not None:
-        title = title.replace('{originalUrl}', original_url)
-    return title
+        subs['originalUrl'] = original_url
+    return subs
+
+def _substitute(template, subs):
+    """Replace known placeholders in one pass, leaving any other braces untouched."""
+    if not subs:
+        return template
+    return _PLACEHOLDER_RE.sub(lambda m: subs.get(m.group(1), m.group(0)), template)
+
+@lru_cache(maxsize=1024)
+def format_title(template, number=None, original_url=None):
+    """Format the title template with provided variables."""
+    return _substitute(template, _substitutions(number, original_url))
 
+@lru_cache(maxsize=1024)
 def format_description(template, number=None, original_url=None):
     """Format the description template with provided variables."""
-    description = template
-    if number is not None:
-        description = description.replace('{number}', str(number))
-    if original_url is not None:
-        description = description.replace('{originalUrl}', original_url)
-    return description
+    return _substitute(template, _substitutions(number, original_url))
+
+def format_both(title_template, description_template, number=None, original_url=None):
+    """Format the title and description templates with one shared mapping."""
+    subs = _substitutions(number, original_url)
+    return _substitute(title_template, subs), _substitute(description_template, subs)
+
+def is_valid_youtube_url(url):
+    """Return True if the URL looks like a YouTube video or playlist URL."""
+    return _YT_URL_RE.fullmatch(url) is not None
 
 def validate_url(url):
     """Validate if the URL is a valid YouTube video or playlist URL."""
-    youtube_pattern = r'^(https?://)?(www\.)?(youtube\.com|youtu\.be)/.+$'
-    if not re.match(youtube_pattern, url):
+    if not is_valid_youtube_url(url):
         st.error("Invalid YouTube URL format")
         return False
     return True
 
+def create_directory(path):
+    """Create a directory if it doesn't exist; return True if it was created."""
+    try:
+        os.makedirs(path)
+        return True
+    except FileExistsError:
+        if not os.path.isdir(path):
+            raise
+        return False
+
 def ensure_directory(path):
     """Ensure that a directory exists, create it if it doesn't."""
-    if not os.path.exists(path):
-        os.makedirs(path)
+    if create_directory(path):
         st.info(f"Created directory: {path}")
     return path
 
+@lru_cache(maxsize=1024)
 def clean_filename(filename):
     """Clean a filename by removing invalid characters."""
     # Remove invalid characters
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+    filename = filename.translate(_FN_DELETE)
     # Remove leading/trailing spaces and dots
     filename = filename.strip('. ')
     # Ensure the filename is not empty
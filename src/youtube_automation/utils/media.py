@@ -0,0 +1,203 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from functools import lru_cache
+
+# Hardware H.264 encoders in order of preference, with their encoder options
+HW_ENCODERS = {
+    'h264_nvenc': ('-preset', 'p4', '-b:v', '8M'),
+    'h264_qsv': ('-preset', 'faster', '-b:v', '8M'),
+    'h264_vaapi': ('-vaapi_device', '/dev/dri/renderD128', '-vf', 'format=nv12,hwupload', '-b:v', '8M'),
+    'h264_videotoolbox': ('-b:v', '8M')
+}
+
+def ffmpeg_binary():
+    """Return the ffmpeg executable MoviePy is configured to use."""
+    from moviepy.config import get_setting
+    return get_setting('FFMPEG_BINARY')
+
+@lru_cache(maxsize=1)
+def detect_video_encoder():
+    """Pick the fastest H.264 encoder that works on this machine.
+    
+    Returns an (encoder, ffmpeg_params) tuple. ffmpeg builds list hardware
+    encoders even when the hardware is missing, so each candidate has to pass
+    a tiny test encode. Falls back to software libx264.
+    """
+    ffmpeg = ffmpeg_binary()
+    try:
+        available = subprocess.run(
+            [ffmpeg, '-hide_banner', '-encoders'],
+            capture_output=True,
+            text=True
+        ).stdout
+    except OSError:
+        available = ''
+    
+    for encoder, params in HW_ENCODERS.items():
+        if f" {encoder} " not in available:
+            continue
+        try:
+            result = subprocess.run(
+                [ffmpeg, '-hide_banner', '-v', 'error',
+                 '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+                 '-c:v', encoder, *params, '-f', 'null', '-'],
+                capture_output=True,
+                timeout=15
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if result.returncode == 0:
+            return encoder, params
+    
+    return 'libx264', ()
+
+def _split_encoder_filter(encoder_params):
+    """Separate an encoder's own video filter (VAAPI's hwupload) from its options.
+    
+    The filter has to be appended to our own filter chain, since ffmpeg only
+    takes one -vf per output and none alongside -filter_complex. Returns a
+    (video_filter, params) tuple; video_filter is None for most encoders.
+    """
+    params = list(encoder_params)
+    if '-vf' not in params:
+        return None, params
+    index = params.index('-vf')
+    video_filter = params[index + 1]
+    del params[index:index + 2]
+    return video_filter, params
+
+def probe_video(path):
+    """Get the stream formats of a video file with ffprobe.
+    
+    Returns a dict describing the first video and audio streams, or None if
+    ffprobe is not installed or the file can't be read.
+    """
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe:
+        return None
+    
+    try:
+        result = subprocess.run(
+            [ffprobe, '-v', 'error',
+             '-show_entries', 'stream=codec_type,codec_name,width,height,pix_fmt,r_frame_rate,sample_rate,channels',
+             '-of', 'json', path],
+            capture_output=True,
+            check=True
+        )
+        streams = json.loads(result.stdout).get('streams', [])
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+    
+    video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+    if video is None:
+        return None
+    
+    return {
+        'video_codec': video.get('codec_name'),
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'pix_fmt': video.get('pix_fmt'),
+        'fps': video.get('r_frame_rate'),
+        'audio_codec': audio.get('codec_name'),
+        'sample_rate': audio.get('sample_rate'),
+        'channels': audio.get('channels')
+    }
+
+def can_stream_copy(first_info, second_info):
+    """Check whether two probed videos can be joined without re-encoding."""
+    return first_info is not None and first_info == second_info
+
+def concat_stream_copy(paths, output_path):
+    """Join videos with ffmpeg's concat demuxer, copying packets without re-encoding.
+    
+    All inputs must share codecs, resolution and frame rate (see can_stream_copy).
+    Returns True if ffmpeg succeeded.
+    """
+    fd, list_path = tempfile.mkstemp(suffix='.txt', dir=os.path.dirname(output_path) or None)
+    try:
+        with os.fdopen(fd, 'w') as list_file:
+            for path in paths:
+                escaped_path = os.path.abspath(path).replace("'", "'\\''")
+                list_file.write(f"file '{escaped_path}'\n")
+        
+        result = subprocess.run(
+            [ffmpeg_binary(), '-y', '-v', 'error',
+             '-f', 'concat', '-safe', '0', '-i', list_path,
+             '-c', 'copy', output_path],
+            capture_output=True
+        )
+        return result.returncode == 0
+    finally:
+        os.remove(list_path)
+
+def concat_reencode(first_path, second_path, output_path, first_info, second_info):
+    """Join two videos in a single ffmpeg pass, re-encoding once.
+    
+    The second video is scaled and padded to the first one's resolution and
+    frame rate inside the same filter graph. Both videos need an audio stream.
+    Returns True if ffmpeg succeeded.
+    """
+    width, height = first_info['width'], first_info['height']
+    second_chain = 'setsar=1'
+    if (second_info['width'], second_info['height']) != (width, height):
+        second_chain = (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+                        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1")
+    if first_info['fps'] and second_info['fps'] != first_info['fps']:
+        second_chain += f",fps={first_info['fps']}"
+    
+    encoder, encoder_params = detect_video_encoder()
+    encoder_filter, encoder_params = _split_encoder_filter(encoder_params)
+    output_chain = 'format=yuv420p'
+    if encoder_filter:
+        output_chain += ',' + encoder_filter
+    
+    audio_chain = 'aformat=sample_fmts=fltp:sample_rates=44100:channel_layouts=stereo'
+    filter_graph = (
+        f"[0:v]setsar=1[v0];[1:v]{second_chain}[v1];"
+        f"[0:a]{audio_chain}[a0];[1:a]{audio_chain}[a1];"
+        f"[v0][a0][v1][a1]concat=n=2:v=1:a=1[vc][a];"
+        f"[vc]{output_chain}[v]"
+    )
+    
+    result = subprocess.run(
+        [ffmpeg_binary(), '-y', '-v', 'error',
+         '-i', first_path, '-i', second_path,
+         '-filter_complex', filter_graph,
+         '-map', '[v]', '-map', '[a]',
+         '-c:v', encoder, *encoder_params,
+         '-c:a', 'aac', '-movflags', '+faststart',
+         output_path],
+        capture_output=True
+    )
+    return result.returncode == 0
+
+def scale_and_pad(input_path, output_path, width, height, high_quality=False):
+    """Resize a video to fit width x height in a single ffmpeg pass.
+    
+    The aspect ratio is kept and the remaining space padded with black bars.
+    The audio is copied without re-encoding. high_quality uses the slower
+    Lanczos scaler. Returns a (success, error_output) tuple.
+    """
+    scaler = ':flags=lanczos' if high_quality else ''
+    video_filter = (f"scale={width}:{height}:force_original_aspect_ratio=decrease{scaler},"
+                    f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2:color=black,setsar=1,format=yuv420p")
+    
+    encoder, encoder_params = detect_video_encoder()
+    encoder_filter, encoder_params = _split_encoder_filter(encoder_params)
+    if encoder_filter:
+        video_filter += ',' + encoder_filter
+    
+    result = subprocess.run(
+        [ffmpeg_binary(), '-y', '-v', 'error',
+         '-i', input_path,
+         '-vf', video_filter,
+         '-c:v', encoder, *encoder_params,
+         '-c:a', 'copy',
+         output_path],
+        capture_output=True
+    )
+    return result.returncode == 0, result.stderr.decode(errors='replace')